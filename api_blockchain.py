@@ -3,17 +3,94 @@ Coffee Traceability API
 RESTful API for the coffee blockchain system
 """
 
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Flask, request, jsonify, Response, stream_with_context
 from blockchain import Blockchain
+from cachetools import LRUCache, TTLCache, cached
 import jwt
+import base64
 import datetime
+import hashlib
+import hmac
+import json
+import threading
+import time
 from functools import wraps
 import os
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
-CORS(app)  # Enable CORS for frontend integration
+
+# CORS for the static frontend: one precomputed header dict instead of the
+# per-request pattern matching flask_cors does
+_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Authorization,Content-Type',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
+
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers.update(_CORS_HEADERS)
+    return response
+
+
+@app.route('/<path:_any>', methods=['OPTIONS'])
+def cors_preflight(_any):
+    return '', 204
+
+_BEARER = 'Bearer '
+
+
+# Health probes hit /api/health every few seconds; formatting an ISO
+# timestamp per request is wasted work, so cache the string for 1s.
+# add_entry keeps calling datetime.now() directly -- block timestamps
+# feed the hash and must stay unique.
+_TS_CACHE = [0.0, '']
+
+
+def now_iso():
+    """ISO-8601 timestamp, cached with one-second granularity"""
+    t = time.time()
+    if t - _TS_CACHE[0] > 1.0:
+        _TS_CACHE[0] = t
+        _TS_CACHE[1] = datetime.datetime.fromtimestamp(t).isoformat()
+    return _TS_CACHE[1]
+
+
+# Cache of already-verified tokens so repeated requests with the same bearer
+# token skip the HMAC verification (tokens live for 24h, so hits dominate).
+# Keyed by a short digest of the token; only successful decodes are cached.
+_token_cache = TTLCache(maxsize=10000, ttl=60)
+_token_cache_lock = threading.Lock()
+
+# Pre-encoded secret for signature checks (encoding it per request adds up)
+_SECRET = app.config['SECRET_KEY'].encode()
+
+
+def _decode_token(token):
+    """
+    Verify an HS256 token by checking the MAC over the header.payload slice
+    directly. Cheaper than a full jwt.decode (no header parse, single split)
+    while keeping the same signature and expiry guarantees.
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split('.')
+        mac = hmac.new(_SECRET, f'{header_b64}.{payload_b64}'.encode(), hashlib.sha256).digest()
+        signature = base64.urlsafe_b64decode(signature_b64 + '==')
+        if not hmac.compare_digest(mac, signature):
+            raise jwt.InvalidTokenError('Signature verification failed')
+        claims = json.loads(base64.urlsafe_b64decode(payload_b64 + '=='))
+        expires_at = claims['exp']
+    except jwt.InvalidTokenError:
+        raise
+    except (ValueError, TypeError, KeyError):
+        raise jwt.InvalidTokenError('Token is malformed')
+
+    if expires_at < time.time():
+        raise jwt.ExpiredSignatureError('Token has expired')
+
+    return claims
 
 # Initialize blockchain
 coffee_chain = Blockchain()
@@ -26,36 +103,69 @@ USERS = {
     'client2': {'password': 'client456', 'role': 'client', 'name': 'Ana Costa'}
 }
 
+# Password digests computed once at import instead of per login attempt
+_USER_PW_HASHES = {
+    username: hashlib.sha256(info['password'].encode()).hexdigest()
+    for username, info in USERS.items()
+}
+
+
+def _password_cache_key(stored_hash, password):
+    # Key the memo on the candidate digest, never the plaintext, so a
+    # heap dump of the cache yields nothing an attacker can replay
+    return stored_hash, hashlib.sha256(password.encode()).hexdigest()
+
+
+@cached(LRUCache(maxsize=4096), key=_password_cache_key)
+def _verify_password(stored_hash, password):
+    """
+    Credential check, memoized per (hash, digest) pair. SHA-256 is cheap
+    today, but the memo means a move to bcrypt/argon2 won't make repeat
+    logins pay the slow hash every time.
+    """
+    candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(stored_hash, candidate)
+
 
 def token_required(f):
     """Decorator to require JWT token for protected routes"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Check if token is in headers
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(' ')[1]  # Bearer <token>
-            except IndexError:
-                return jsonify({'error': 'Invalid token format'}), 401
-        
+        # Slice off the 'Bearer ' prefix directly; no split, no list
+        auth_header = request.headers.get('Authorization')
+        if not auth_header:
+            return jsonify({'error': 'Token is missing'}), 401
+        if not auth_header.startswith(_BEARER):
+            return jsonify({'error': 'Invalid token format'}), 401
+
+        token = auth_header[len(_BEARER):]
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = {
-                'username': data['username'],
-                'role': data['role'],
-                'name': data['name']
-            }
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Token is invalid'}), 401
-        
+        cache_key = hashlib.sha256(token.encode()).digest()[:16]
+        with _token_cache_lock:
+            cached = _token_cache.get(cache_key)
+
+        if cached is not None:
+            data, exp = cached
+            if exp <= time.time():
+                return jsonify({'error': 'Token has expired'}), 401
+        else:
+            try:
+                data = _decode_token(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({'error': 'Token has expired'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'error': 'Token is invalid'}), 401
+            with _token_cache_lock:
+                _token_cache[cache_key] = (data, data['exp'])
+
+        current_user = {
+            'username': data['username'],
+            'role': data['role'],
+            'name': data['name']
+        }
+
         return f(current_user, *args, **kwargs)
     
     return decorated
@@ -90,7 +200,7 @@ def login():
     
     # Validate credentials (replace with real database query)
     user = USERS.get(username)
-    if not user or user['password'] != password:
+    if not user or not _verify_password(_USER_PW_HASHES[username], password):
         return jsonify({'error': 'Invalid credentials'}), 401
     
     # Generate JWT token
@@ -170,9 +280,21 @@ def get_all_entries(current_user):
     """
     Get all coffee entries
     Accessible by both fiscalizers and clients
+    Send 'Accept: application/x-ndjson' to stream one entry per line
+    instead of materializing the whole chain in memory
     """
+    if 'application/x-ndjson' in request.headers.get('Accept', ''):
+        def generate():
+            # Same flattened per-entry dicts as the JSON branch below —
+            # batch blocks unfold into one line per entry
+            for entry in coffee_chain.get_all_entries_iter():
+                yield json.dumps(entry, ensure_ascii=False) + '\n'
+
+        return Response(stream_with_context(generate()),
+                        mimetype='application/x-ndjson')
+
     entries = coffee_chain.get_all_entries()
-    
+
     return jsonify({
         'entries': entries,
         'total': len(entries)
@@ -266,7 +388,7 @@ def health_check():
         'status': 'healthy',
         'blockchain_length': len(coffee_chain.chain),
         'blockchain_valid': coffee_chain.is_chain_valid(),
-        'timestamp': datetime.datetime.now().isoformat()
+        'timestamp': now_iso()
     }), 200
 
 
@@ -307,6 +429,9 @@ if __name__ == '__main__':
     print("  GET    /api/blockchain/validate")
     print("  GET    /api/blockchain/export (fiscalizers only)")
     print("  GET    /api/health")
-    print("\nStarting server on http://localhost:5000\n")
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    print("\nStarting dev server on http://localhost:5000")
+    print("For production use: gunicorn -w 4 -k gthread --threads 8 wsgi:app\n")
+
+    # debug=True forces the single-threaded reloader; keep it opt-in
+    app.run(host='0.0.0.0', port=5000, threaded=True,
+            debug=os.environ.get('FLASK_DEBUG') == '1')
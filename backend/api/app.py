@@ -9,17 +9,94 @@ import os
 # Add backend to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from flask import Flask, request, jsonify, Response, stream_with_context
 from blockchain.blockchain import Blockchain
 from database.database import get_database
+from cachetools import TTLCache
 import jwt
+import base64
 import datetime
+import hashlib
+import hmac
+import json
+import threading
+import time
 from functools import wraps
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
-CORS(app)
+
+# CORS for the static frontend: one precomputed header dict instead of the
+# per-request pattern matching flask_cors does
+_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Authorization,Content-Type',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
+
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers.update(_CORS_HEADERS)
+    return response
+
+
+@app.route('/<path:_any>', methods=['OPTIONS'])
+def cors_preflight(_any):
+    return '', 204
+
+_BEARER = 'Bearer '
+
+
+# Health probes hit /api/health every few seconds; formatting an ISO
+# timestamp per request is wasted work, so cache the string for 1s.
+# add_entry keeps calling datetime.now() directly -- block timestamps
+# feed the hash and must stay unique.
+_TS_CACHE = [0.0, '']
+
+
+def now_iso():
+    """ISO-8601 timestamp, cached with one-second granularity"""
+    t = time.time()
+    if t - _TS_CACHE[0] > 1.0:
+        _TS_CACHE[0] = t
+        _TS_CACHE[1] = datetime.datetime.fromtimestamp(t).isoformat()
+    return _TS_CACHE[1]
+
+
+# Cache of already-verified tokens so repeated requests with the same bearer
+# token skip the HMAC verification (tokens live for 24h, so hits dominate).
+# Keyed by a short digest of the token; only successful decodes are cached.
+_token_cache = TTLCache(maxsize=10000, ttl=60)
+_token_cache_lock = threading.Lock()
+
+# Pre-encoded secret for signature checks (encoding it per request adds up)
+_SECRET = app.config['SECRET_KEY'].encode()
+
+
+def _decode_token(token):
+    """
+    Verify an HS256 token by checking the MAC over the header.payload slice
+    directly. Cheaper than a full jwt.decode (no header parse, single split)
+    while keeping the same signature and expiry guarantees.
+    """
+    try:
+        header_b64, payload_b64, signature_b64 = token.split('.')
+        mac = hmac.new(_SECRET, f'{header_b64}.{payload_b64}'.encode(), hashlib.sha256).digest()
+        signature = base64.urlsafe_b64decode(signature_b64 + '==')
+        if not hmac.compare_digest(mac, signature):
+            raise jwt.InvalidTokenError('Signature verification failed')
+        claims = json.loads(base64.urlsafe_b64decode(payload_b64 + '=='))
+        expires_at = claims['exp']
+    except jwt.InvalidTokenError:
+        raise
+    except (ValueError, TypeError, KeyError):
+        raise jwt.InvalidTokenError('Token is malformed')
+
+    if expires_at < time.time():
+        raise jwt.ExpiredSignatureError('Token has expired')
+
+    return claims
 
 # Initialize blockchain with persistent storage
 coffee_chain = Blockchain(storage_path='data/blockchain.json')
@@ -34,30 +111,41 @@ def token_required(f):
     """Decorator to require JWT token"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                token = auth_header.split(' ')[1]
-            except IndexError:
-                return jsonify({'error': 'Invalid token format'}), 401
-        
+        # Slice off the 'Bearer ' prefix directly; no split, no list
+        auth_header = request.headers.get('Authorization')
+        if not auth_header:
+            return jsonify({'error': 'Token is missing'}), 401
+        if not auth_header.startswith(_BEARER):
+            return jsonify({'error': 'Invalid token format'}), 401
+
+        token = auth_header[len(_BEARER):]
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         
-        try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = {
-                'username': data['username'],
-                'role': data['role'],
-                'name': data['name']
-            }
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Token is invalid'}), 401
-        
+        cache_key = hashlib.sha256(token.encode()).digest()[:16]
+        with _token_cache_lock:
+            cached = _token_cache.get(cache_key)
+
+        if cached is not None:
+            data, exp = cached
+            if exp <= time.time():
+                return jsonify({'error': 'Token has expired'}), 401
+        else:
+            try:
+                data = _decode_token(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({'error': 'Token has expired'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'error': 'Token is invalid'}), 401
+            with _token_cache_lock:
+                _token_cache[cache_key] = (data, data['exp'])
+
+        current_user = {
+            'username': data['username'],
+            'role': data['role'],
+            'name': data['name']
+        }
+
         return f(current_user, *args, **kwargs)
     
     return decorated
@@ -157,9 +245,21 @@ def create_entry(current_user):
 @app.route('/api/entries', methods=['GET'])
 @token_required
 def get_all_entries(current_user):
-    """Get all coffee entries"""
+    """
+    Get all coffee entries
+    Send 'Accept: application/x-ndjson' to stream one entry per line
+    instead of materializing the whole chain in memory
+    """
+    if 'application/x-ndjson' in request.headers.get('Accept', ''):
+        def generate():
+            for block in coffee_chain.chain[1:]:
+                yield json.dumps(block.to_dict(), ensure_ascii=False) + '\n'
+
+        return Response(stream_with_context(generate()),
+                        mimetype='application/x-ndjson')
+
     entries = coffee_chain.get_all_entries()
-    
+
     return jsonify({
         'entries': entries,
         'total': len(entries)
@@ -170,18 +270,29 @@ def get_all_entries(current_user):
 @token_required
 def get_entry_by_batch(current_user, batch_id):
     """Get entries by coffee batch ID"""
-    # Try database index first for faster lookup
-    db_entry = db.find_by_batch(batch_id)
-    
-    # Get full data from blockchain
-    entries = coffee_chain.get_entry_by_batch(batch_id)
-    
+    # Database index first: it maps the batch straight to block indexes,
+    # so the full data is an O(1) chain fetch away
+    chain = coffee_chain.chain
+    idxs = db.find_indexes_by_batch(batch_id)
+    # The database and the chain file live side by side and can drift
+    # (one restored or deleted without the other), so only serve blocks
+    # that actually carry the queried batch
+    entries = [chain[i].to_dict() for i in idxs
+               if 0 <= i < len(chain)
+               and chain[i].data.get('coffee_batch') == batch_id]
+
+    # The index keeps one row per batch (the latest); when a batch spans
+    # several blocks, or was never indexed, the chain lookup knows more
+    chain_entries = coffee_chain.get_entry_by_batch(batch_id)
+    if chain_entries and len(chain_entries) > len(entries):
+        entries = chain_entries
+
     if entries:
         return jsonify({
             'batch_id': batch_id,
             'entries': entries,
             'total': len(entries),
-            'indexed': db_entry is not None
+            'indexed': bool(idxs)
         }), 200
     else:
         return jsonify({'error': f'No entries found for batch {batch_id}'}), 404
@@ -191,8 +302,19 @@ def get_entry_by_batch(current_user, batch_id):
 @token_required
 def get_entry_by_origin(current_user, origin):
     """Get entries by origin/farm name"""
-    entries = coffee_chain.get_entry_by_origin(origin)
-    
+    chain = coffee_chain.chain
+    idxs = db.find_indexes_by_origin(origin)
+    # Same drift guard as the batch endpoint, case-folded like the
+    # origin index itself
+    origin_key = origin.lower()
+    entries = [chain[i].to_dict() for i in idxs
+               if 0 <= i < len(chain)
+               and (chain[i].data.get('origin') or '').lower() == origin_key]
+
+    chain_entries = coffee_chain.get_entry_by_origin(origin)
+    if chain_entries and len(chain_entries) > len(entries):
+        entries = chain_entries
+
     if entries:
         return jsonify({
             'origin': origin,
@@ -266,7 +388,7 @@ def health_check():
         'blockchain_storage': coffee_chain.storage_path,
         'database_type': db.db_type,
         'database_stats': db.get_stats(),
-        'timestamp': datetime.datetime.now().isoformat()
+        'timestamp': now_iso()
     }), 200
 
 
@@ -320,7 +442,10 @@ if __name__ == '__main__':
     print("  GET    /api/database/stats")
     print("  GET    /api/health")
     
-    print("\n🚀 Starting server on http://localhost:5000")
+    print("\n🚀 Starting dev server on http://localhost:5000")
+    print("   Production: gunicorn -w 4 -k gthread --threads 8 wsgi:app")
     print("="*60 + "\n")
-    
-    app.run(debug=True, host='0.0.0.0', port=5000)
+
+    # debug=True forces the single-threaded reloader; keep it opt-in
+    app.run(host='0.0.0.0', port=5000, threaded=True,
+            debug=os.environ.get('FLASK_DEBUG') == '1')
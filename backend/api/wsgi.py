@@ -0,0 +1,9 @@
+"""
+WSGI entry point for the reorganized API
+
+Run from backend/api so the relative data/ paths resolve:
+
+    gunicorn -w 4 -k gthread --threads 8 wsgi:app
+"""
+
+from app import app  # noqa: F401
@@ -3,16 +3,126 @@ Blockchain Core Module
 Improved version with persistent storage
 """
 
+import atexit
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
+import queue
+import threading
 from datetime import datetime
 from typing import List, Dict, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+if orjson is not None:
+    def _canonical_dumps(obj) -> bytes:
+        """Canonical sorted-key JSON bytes for hashing and storage"""
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+    _loads = orjson.loads
+else:
+    def _canonical_dumps(obj) -> bytes:
+        """Canonical sorted-key JSON bytes for hashing and storage
+
+        Matches orjson's output byte-for-byte (compact separators, UTF-8)
+        so hashes are identical with or without orjson installed.
+        """
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'),
+                          ensure_ascii=False).encode('utf-8')
+
+    _loads = json.loads
+
+
+class _AsyncWriter:
+    """
+    Background writer that drains queued appends to disk in batches,
+    so add_entry is not gated on file I/O. Pending writes are flushed
+    at interpreter exit.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def write(self, data: bytes):
+        """Queue a chunk of bytes for appending to the file"""
+        self._queue.put(data)
+
+    def flush(self):
+        """Block until all queued writes have hit the disk"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                # Drain whatever else is queued so one open() serves a batch
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                with open(self.path, 'ab') as f:
+                    f.writelines(batch)
+            except Exception as e:
+                print(f"Error saving blockchain: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+def _meets_difficulty(digest: bytes, difficulty: int) -> bool:
+    """Check for `difficulty` leading zero hex digits on a raw digest"""
+    full, odd = divmod(difficulty, 2)
+    if digest[:full] != b'\x00' * full:
+        return False
+    return not odd or digest[full] < 16
+
+
+def _mine(head: bytes, tail: bytes, difficulty: int, start_nonce: int = 0):
+    """
+    Nonce search kernel: everything the loop touches is a local, so each
+    attempt is one hash update plus a bytes compare. Returns the winning
+    (nonce, digest) pair.
+
+    The constant head is absorbed into a sha256 object once; each attempt
+    copies that midstate and only feeds it the nonce digits and the short
+    tail, instead of re-hashing the whole serialized block.
+    """
+    base = hashlib.sha256(head)
+    base_copy = base.copy
+    full, odd = divmod(difficulty, 2)
+    zeros = b'\x00' * full
+    nonce = start_nonce
+    while True:
+        h = base_copy()
+        h.update(str(nonce).encode() + tail)
+        digest = h.digest()
+        if digest[:full] == zeros and (not odd or digest[full] < 16):
+            return nonce, digest
+        nonce += 1
+
 
 class Block:
     """Block class for coffee traceability"""
-    
+
+    # No per-instance __dict__: every loaded chain carries one Block per
+    # entry, and slots cut a couple hundred bytes of overhead from each
+    __slots__ = ('index', 'timestamp', 'data', 'previous_hash', 'nonce',
+                 'hash', '_dict_cache')
+
     def __init__(self, index: int, timestamp: str, data: Dict, previous_hash: str, nonce: int = 0):
         self.index = index
         self.timestamp = timestamp
@@ -20,28 +130,71 @@ class Block:
         self.previous_hash = previous_hash
         self.nonce = nonce
         self.hash = self.get_hash()
-    
+        self._dict_cache = None
+
+    @classmethod
+    def from_stored(cls, block_data: Dict) -> 'Block':
+        """
+        Rebuild a block from its stored dict without recomputing the
+        hash. __init__ hashes every new block, which is redundant work
+        at load time: the stored hash is what validation checks against.
+        """
+        block = cls.__new__(cls)
+        block.index = block_data['index']
+        block.timestamp = block_data['timestamp']
+        block.data = block_data['data']
+        block.previous_hash = block_data['previous_hash']
+        block.nonce = block_data['nonce']
+        block.hash = block_data['hash']
+        block._dict_cache = None
+        return block
+
     def get_hash(self) -> str:
         """Calculate SHA-256 hash of the block"""
-        block_string = json.dumps({
+        block_bytes = _canonical_dumps({
             'index': self.index,
             'timestamp': self.timestamp,
             'data': self.data,
             'previous_hash': self.previous_hash,
             'nonce': self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode('utf-8')).hexdigest()
+        })
+        return hashlib.sha256(block_bytes).hexdigest()
     
-    def to_dict(self) -> Dict:
-        """Convert block to dictionary for JSON serialization"""
-        return {
+    def get_legacy_hash(self) -> str:
+        """Hash in the byte form older builds persisted
+
+        Chains saved before the compact canonical form hashed the plain
+        json.dumps rendering: spaced separators, ASCII escapes, sorted
+        keys. Validation retries these bytes before rejecting a block
+        that came off disk.
+        """
+        block_string = json.dumps({
             'index': self.index,
             'timestamp': self.timestamp,
             'data': self.data,
             'previous_hash': self.previous_hash,
-            'nonce': self.nonce,
-            'hash': self.hash
-        }
+            'nonce': self.nonce
+        }, sort_keys=True)
+        return hashlib.sha256(block_string.encode('utf-8')).hexdigest()
+
+    def verify_hash(self) -> bool:
+        """True when the stored hash matches the block's content, in
+        either the current canonical byte form or the legacy one"""
+        return self.get_hash() == self.hash or self.get_legacy_hash() == self.hash
+
+    def to_dict(self) -> Dict:
+        """Convert block to dictionary for JSON serialization"""
+        # Blocks never change after mining, so build the dict once and reuse it
+        if self._dict_cache is None:
+            self._dict_cache = {
+                'index': self.index,
+                'timestamp': self.timestamp,
+                'data': self.data,
+                'previous_hash': self.previous_hash,
+                'nonce': self.nonce,
+                'hash': self.hash
+            }
+        return self._dict_cache
 
 
 class Blockchain:
@@ -51,10 +204,38 @@ class Blockchain:
     """
     
     def __init__(self, storage_path: str = 'data/blockchain.json'):
+        # A '.msgpack' storage_path switches the on-disk format to a
+        # stream of msgpack records, which pack and parse several times
+        # faster than JSON on long chains. Records append just like the
+        # JSONL format, so the async writer works unchanged.
+        self._use_msgpack = storage_path.endswith('.msgpack')
+        if self._use_msgpack and msgpack is None:
+            print("⚠️  msgpack not installed. Run: pip install msgpack")
+            print("   Falling back to JSONL storage...")
+            storage_path = storage_path[:-len('.msgpack')] + '.json'
+            self._use_msgpack = False
+
         self.storage_path = storage_path
         self.chain: List[Block] = []
         self.difficulty = 2
-        
+
+        # In-memory indexes for O(1) lookups instead of full-chain scans
+        self._batch_index: Dict[str, List[int]] = {}
+        self._origin_index: Dict[str, List[int]] = {}
+
+        # Structure-of-arrays mirrors of the per-block hash fields: the
+        # linkage pass of validation only needs these two strings per
+        # block, and scanning flat lists stays cache-resident instead of
+        # chasing a Block object per element
+        self._hashes: List[str] = []
+        self._prev_hashes: List[str] = []
+        self._all_entries_cache: Optional[List[Dict]] = None
+        self._writer = _AsyncWriter(storage_path)
+
+        # Cached validation verdict, keyed by a counter bumped on mutation
+        self._version = 0
+        self._valid_cache: Optional[tuple] = None
+
         # Ensure data directory exists
         os.makedirs(os.path.dirname(storage_path), exist_ok=True)
         
@@ -78,11 +259,23 @@ class Blockchain:
             nonce=0
         )
         self.chain.append(genesis_block)
+        self._hashes.append(genesis_block.hash)
+        self._prev_hashes.append(genesis_block.previous_hash)
     
     def get_latest_block(self) -> Block:
         """Get the most recent block in the chain"""
         return self.chain[-1]
-    
+
+    def _index_block(self, block: Block):
+        """Register a block in the batch and origin indexes"""
+        batch_id = block.data.get('coffee_batch')
+        if batch_id:
+            self._batch_index.setdefault(batch_id, []).append(block.index)
+
+        origin = block.data.get('origin')
+        if origin:
+            self._origin_index.setdefault(origin.lower(), []).append(block.index)
+
     def add_entry(self, entry_data: Dict) -> Dict:
         """
         Add a new coffee traceability entry
@@ -103,14 +296,21 @@ class Blockchain:
         )
         
         # Proof of work
-        new_block = self.proof_of_work(new_block)
+        new_block, digest = self.proof_of_work(new_block)
         
-        # Validate
-        if self.is_valid_new_block(new_block, latest_block):
+        # Validate; the miner already hashed these exact bytes, so hand
+        # the digest over instead of re-hashing
+        if self.is_valid_new_block(new_block, latest_block, expected_digest=digest):
             self.chain.append(new_block)
-            
-            # Auto-save to disk
-            self.save_to_file()
+            self._hashes.append(new_block.hash)
+            self._prev_hashes.append(new_block.previous_hash)
+            self._index_block(new_block)
+            self._all_entries_cache = None
+            self._version += 1
+            self._valid_cache = None
+
+            # Auto-save: append one line instead of rewriting the whole chain
+            self._append_block(new_block)
             
             return {
                 'success': True,
@@ -123,66 +323,100 @@ class Blockchain:
                 'message': 'Invalid block, entry not added'
             }
     
-    def proof_of_work(self, block: Block) -> Block:
-        """Simple proof of work algorithm"""
+    def proof_of_work(self, block: Block):
+        """
+        Simple proof of work algorithm
+        Serializes the block once and only swaps the nonce digits between
+        attempts instead of re-running json.dumps for every candidate hash
+        """
         block.nonce = 0
-        computed_hash = block.get_hash()
-        
-        while not computed_hash.startswith('0' * self.difficulty):
-            block.nonce += 1
-            computed_hash = block.get_hash()
-        
-        block.hash = computed_hash
-        return block
+        serialized = _canonical_dumps({
+            'index': block.index,
+            'timestamp': block.timestamp,
+            'data': block.data,
+            'previous_hash': block.previous_hash,
+            'nonce': block.nonce
+        })
+
+        # Split around the nonce digits; everything else is constant
+        head, _, tail = serialized.rpartition(b'"nonce":0')
+        head = head + b'"nonce":'
+
+        block.nonce, digest = _mine(head, tail, self.difficulty)
+        block.hash = digest.hex()
+        return block, digest
     
-    def is_valid_new_block(self, new_block: Block, previous_block: Block) -> bool:
-        """Validate a new block"""
+    def is_valid_new_block(self, new_block: Block, previous_block: Block,
+                           expected_digest: Optional[bytes] = None) -> bool:
+        """
+        Validate a new block
+        expected_digest is the digest the miner just computed from the
+        block's serialized bytes; passing it skips a redundant re-hash.
+        Leave it None whenever the block comes from outside.
+        """
         if previous_block.index + 1 != new_block.index:
             return False
         if previous_block.hash != new_block.previous_hash:
             return False
-        if new_block.get_hash() != new_block.hash:
+        digest = expected_digest if expected_digest is not None else bytes.fromhex(new_block.get_hash())
+        if digest.hex() != new_block.hash:
             return False
-        if not new_block.hash.startswith('0' * self.difficulty):
+        if not _meets_difficulty(digest, self.difficulty):
             return False
         return True
     
+    # Below this size a thread pool costs more than it saves
+    _PARALLEL_VALIDATE_MIN = 256
+
     def is_chain_valid(self) -> bool:
         """Validate the entire blockchain"""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
-            
-            if current_block.hash != current_block.get_hash():
-                return False
-            if current_block.previous_hash != previous_block.hash:
+        # The health endpoint calls this on every probe; reuse the last
+        # verdict until the chain changes
+        if self._valid_cache is not None and self._valid_cache[0] == self._version:
+            return self._valid_cache[1]
+
+        result = self._validate_chain()
+        self._valid_cache = (self._version, result)
+        return result
+
+    def _validate_chain(self) -> bool:
+        """Full validation pass over the chain"""
+        # Linkage and difficulty checks run over the flat hash mirrors,
+        # not the Block objects — two tight string lists instead of an
+        # attribute lookup per block
+        hashes = self._hashes
+        prev_hashes = self._prev_hashes
+        prefix = '0' * self.difficulty
+        for i in range(1, len(hashes)):
+            if prev_hashes[i] != hashes[i - 1]:
                 return False
-            if not current_block.hash.startswith('0' * self.difficulty):
+            if not hashes[i].startswith(prefix):
                 return False
-        
-        return True
+
+        # Re-hashing each block is independent work, and hashlib releases
+        # the GIL, so long chains are verified across all cores
+        blocks = self.chain[1:]
+        if len(blocks) >= self._PARALLEL_VALIDATE_MIN:
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                return all(executor.map(Block.verify_hash, blocks))
+
+        return all(block.verify_hash() for block in blocks)
     
     def get_entry_by_batch(self, batch_id: str) -> Optional[List[Dict]]:
         """Get all entries for a specific coffee batch"""
-        results = []
-        for block in self.chain[1:]:  # Skip genesis
-            if block.data.get('coffee_batch') == batch_id:
-                results.append(block.to_dict())
-        
+        results = [self.chain[i].to_dict() for i in self._batch_index.get(batch_id, [])]
         return results if results else None
-    
+
     def get_entry_by_origin(self, origin: str) -> Optional[List[Dict]]:
         """Get all entries from a specific origin"""
-        results = []
-        for block in self.chain[1:]:
-            if block.data.get('origin', '').lower() == origin.lower():
-                results.append(block.to_dict())
-        
+        results = [self.chain[i].to_dict() for i in self._origin_index.get(origin.lower(), [])]
         return results if results else None
     
     def get_all_entries(self) -> List[Dict]:
         """Get all entries in the blockchain"""
-        return [block.to_dict() for block in self.chain[1:]]
+        if self._all_entries_cache is None:
+            self._all_entries_cache = [block.to_dict() for block in self.chain[1:]]
+        return self._all_entries_cache
     
     def get_chain_info(self) -> Dict:
         """Get information about the blockchain"""
@@ -194,44 +428,82 @@ class Blockchain:
             'storage_path': self.storage_path
         }
     
+    def _dump_block(self, block_dict: Dict) -> bytes:
+        """Encode one block as a storage record (JSONL or msgpack)"""
+        if self._use_msgpack:
+            return msgpack.packb(block_dict, use_bin_type=True)
+        return _canonical_dumps(block_dict) + b'\n'
+
     def save_to_file(self):
-        """Save blockchain to JSON file"""
+        """Save the full blockchain, one record per block"""
         try:
-            chain_data = {
-                'chain': [block.to_dict() for block in self.chain],
-                'length': len(self.chain),
-                'difficulty': self.difficulty,
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            with open(self.storage_path, 'w', encoding='utf-8') as f:
-                json.dump(chain_data, f, indent=2, ensure_ascii=False)
-            
+            self._writer.flush()
+            # 1 MiB buffer batches the per-block writes into few syscalls
+            with open(self.storage_path, 'wb', buffering=1 << 20) as f:
+                for block in self.chain:
+                    f.write(self._dump_block(block.to_dict()))
+
             return True
         except Exception as e:
             print(f"Error saving blockchain: {str(e)}")
             return False
-    
+
+    def _append_block(self, block: Block):
+        """Queue a single block record for appending to the storage file"""
+        self._writer.write(self._dump_block(block.to_dict()))
+        return True
+
     def load_from_file(self):
-        """Load blockchain from JSON file"""
+        """
+        Load blockchain from disk
+        Reads the record stream (JSONL or msgpack); still understands
+        the legacy single-JSON format and migrates it on the spot
+        """
         try:
-            with open(self.storage_path, 'r', encoding='utf-8') as f:
-                chain_data = json.load(f)
-            
+            legacy = False
+            if self._use_msgpack:
+                # Streaming unpack: each record is decoded as it is read,
+                # never materializing the whole file as one object
+                with open(self.storage_path, 'rb') as f:
+                    block_dicts = list(msgpack.Unpacker(f, raw=False))
+            else:
+                with open(self.storage_path, 'r', encoding='utf-8') as f:
+                    first_line = f.readline()
+                    legacy = first_line.lstrip().startswith('{"chain"') or first_line.strip() == '{'
+                    if legacy:
+                        f.seek(0)
+                        chain_data = json.load(f)
+                        block_dicts = chain_data['chain']
+                        if 'difficulty' in chain_data:
+                            self.difficulty = chain_data['difficulty']
+                    else:
+                        block_dicts = [_loads(first_line)]
+                        block_dicts.extend(_loads(line) for line in f if line.strip())
+
             self.chain = []
-            for block_data in chain_data['chain']:
-                block = Block(
-                    index=block_data['index'],
-                    timestamp=block_data['timestamp'],
-                    data=block_data['data'],
-                    previous_hash=block_data['previous_hash'],
-                    nonce=block_data['nonce']
-                )
+            self._hashes = []
+            self._prev_hashes = []
+            self._batch_index.clear()
+            self._origin_index.clear()
+            self._all_entries_cache = None
+            self._version += 1
+            self._valid_cache = None
+            for block_data in block_dicts:
+                block = Block.from_stored(block_data)
                 self.chain.append(block)
-            
-            if 'difficulty' in chain_data:
-                self.difficulty = chain_data['difficulty']
-            
+                self._hashes.append(block.hash)
+                self._prev_hashes.append(block.previous_hash)
+                self._index_block(block)
+
+            if legacy:
+                # Migrate to the record-stream format only when the
+                # loaded chain actually verifies; rewriting a chain that
+                # can never validate again would destroy the evidence
+                if self._validate_chain():
+                    self.save_to_file()
+                else:
+                    print(f"⚠️  Loaded chain failed validation; leaving {self.storage_path} in the legacy format")
+
             return True
         except Exception as e:
             print(f"Error loading blockchain: {str(e)}")
@@ -244,16 +516,18 @@ class Blockchain:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_path = os.path.join(backup_dir, f'blockchain_backup_{timestamp}.json')
         
-        chain_data = {
-            'chain': [block.to_dict() for block in self.chain],
-            'length': len(self.chain),
-            'difficulty': self.difficulty,
-            'backup_created': datetime.now().isoformat()
-        }
-        
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            json.dump(chain_data, f, indent=2, ensure_ascii=False)
-        
+        # Stream the backup block-by-block through a 1 MiB buffer rather
+        # than materializing the whole chain as one in-memory document
+        with open(backup_path, 'wb', buffering=1 << 20) as f:
+            f.write(b'{"chain":[')
+            for i, block in enumerate(self.chain):
+                if i:
+                    f.write(b',')
+                f.write(_canonical_dumps(block.to_dict()))
+            f.write(b'],"length":%d,"difficulty":%d,"backup_created":%s}'
+                    % (len(self.chain), self.difficulty,
+                       _canonical_dumps(datetime.now().isoformat())))
+
         return backup_path
 
 
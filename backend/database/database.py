@@ -4,12 +4,73 @@ Supports both MongoDB and SQLite
 """
 
 import os
+import re
 import sqlite3
+import threading
+import time
 import hashlib
+import hmac
 from typing import Optional, Dict, List
 from datetime import datetime
 
-    
+from cachetools import LRUCache, cached
+
+
+def _password_cache_key(stored_hash: str, password: str):
+    # Key the memo on the candidate digest, never the plaintext, so a
+    # heap dump of the cache yields nothing an attacker can replay
+    return stored_hash, hashlib.sha256(password.encode()).hexdigest()
+
+
+@cached(LRUCache(maxsize=4096), key=_password_cache_key)
+def _verify_password(stored_hash: str, password: str) -> bool:
+    """
+    Credential check, memoized per (hash, digest) pair. SHA-256 is cheap
+    today, but the memo means a move to bcrypt/argon2 won't make repeat
+    logins pay the slow hash every time. A password change alters the
+    stored hash, which naturally invalidates the memo.
+    """
+    candidate = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(stored_hash, candidate)
+
+
+# Default test users with password hashes computed once at import time
+# instead of on every process start. Hashes stay hex TEXT: existing
+# database files store them that way, and a BLOB column would strand
+# every deployed coffeechain.db.
+_DEFAULT_USERS = [
+    ('fiscalizer1', hashlib.sha256(b'fisc123').hexdigest(), 'fiscalizer', 'João Silva'),
+    ('fiscalizer2', hashlib.sha256(b'fisc456').hexdigest(), 'fiscalizer', 'Maria Santos'),
+    ('client1', hashlib.sha256(b'client123').hexdigest(), 'client', 'Carlos Souza'),
+    ('client2', hashlib.sha256(b'client456').hexdigest(), 'client', 'Ana Costa'),
+]
+
+
+# Per-call SQL hoisted to constants: SQLite's per-connection statement
+# cache keys on exact string identity, so reusing the same object means
+# every call after the first skips the parse/plan step
+_SQL_GET_USER = 'SELECT * FROM users WHERE username = ?'
+_SQL_INSERT_USER = '''
+    INSERT INTO users (username, password_hash, role, name)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_INSERT_DEFAULT_USERS = '''
+    INSERT OR IGNORE INTO users (username, password_hash, role, name)
+    VALUES (?, ?, ?, ?)
+'''
+_SQL_UPDATE_LAST_LOGIN = 'UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE username = ?'
+_SQL_INSERT_INDEX = '''
+    INSERT OR REPLACE INTO blockchain_index
+    (batch_id, block_index, block_hash, timestamp, fiscalizer_id, origin, quality_grade, weight_kg)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_FIND_BATCH = 'SELECT * FROM blockchain_index WHERE batch_id = ?'
+_SQL_FIND_ORIGIN_LIKE = 'SELECT * FROM blockchain_index WHERE origin LIKE ?'
+_SQL_BATCH_INDEXES = 'SELECT block_index FROM blockchain_index WHERE batch_id = ?'
+_SQL_ORIGIN_INDEXES = 'SELECT block_index FROM blockchain_index WHERE LOWER(origin) = LOWER(?) ORDER BY block_index'
+_SQL_ALL_INDEXES = 'SELECT * FROM blockchain_index ORDER BY block_index'
+
+
 class Database:
     """
     Abstract database class that can use MongoDB or SQLite
@@ -26,17 +87,44 @@ class Database:
     def _init_sqlite(self, db_path='data/coffeechain.db'):
         """Initialize SQLite database"""
         os.makedirs(os.path.dirname(db_path) if os.path.dirname(db_path) else '.', exist_ok=True)
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+        self.db_path = db_path
+        # One connection per thread: a single shared connection (and
+        # shared cursor) serializes every query on the connection lock
+        # and races under concurrent Flask workers. Each thread opens
+        # its own connection lazily in _get_conn(); WAL lets them read
+        # and write concurrently.
+        self._local = threading.local()
         self._create_sqlite_tables()
+        self._get_conn().execute('PRAGMA optimize')
         print(f"✓ SQLite database initialized at {db_path}")
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Get this thread's SQLite connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            # WAL lets readers run while a write commits and halves the
+            # fsync cost of each commit (synchronous=NORMAL is durable
+            # in WAL). mmap and the larger page cache keep index scans
+            # in memory. Note: WAL expects the db file on local
+            # storage, not a network mount.
+            conn.executescript('''
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                PRAGMA mmap_size=1073741824;
+                PRAGMA cache_size=-65536;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA wal_autocheckpoint=1000;
+            ''')
+            self._local.conn = conn
+        return conn
     
     def _init_mongodb(self, host='localhost', port=27017, db_name='coffeechain'):
         """Initialize MongoDB connection"""
         try:
             from pymongo import MongoClient
-            self.client = MongoClient(host, port)
+            self.client = MongoClient(host, port, maxPoolSize=50)
             self.db = self.client[db_name]
             self._create_mongodb_collections()
             print(f"✓ MongoDB connected: {host}:{port}/{db_name}")
@@ -53,8 +141,10 @@ class Database:
     
     def _create_sqlite_tables(self):
         """Create SQLite tables"""
+        conn = self._get_conn()
+
         # Users table
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 username TEXT UNIQUE NOT NULL,
@@ -68,7 +158,7 @@ class Database:
         ''')
         
         # Blockchain index table
-        self.cursor.execute('''
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS blockchain_index (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 batch_id TEXT UNIQUE NOT NULL,
@@ -84,11 +174,17 @@ class Database:
         ''')
         
         # Create indexes
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_batch_id ON blockchain_index(batch_id)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_origin ON blockchain_index(origin)')
-        self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_fiscalizer ON blockchain_index(fiscalizer_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_batch_id ON blockchain_index(batch_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_origin ON blockchain_index(origin)')
+        # Expression index so case-insensitive origin lookups stay indexed
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_origin_lower ON blockchain_index(LOWER(origin))')
+        # The idx_origin_batch covering index served only the anchored
+        # origin probe, which was removed as unsound; drop it so it
+        # stops taxing every insert on databases that created it
+        conn.execute('DROP INDEX IF EXISTS idx_origin_batch')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_fiscalizer ON blockchain_index(fiscalizer_id)')
         
-        self.conn.commit()
+        conn.commit()
         
         # Create default users if table is empty
         self._create_default_users_sqlite()
@@ -99,6 +195,9 @@ class Database:
         self.db.users.create_index('username', unique=True)
         self.db.blockchain_index.create_index('batch_id', unique=True)
         self.db.blockchain_index.create_index('origin')
+        # Normalized lowercase origin: anchored queries on it are index
+        # range scans, unlike a case-insensitive regex on 'origin'
+        self.db.blockchain_index.create_index('origin_lower')
         self.db.blockchain_index.create_index('fiscalizer_id')
         
         # Create default users if collection is empty
@@ -106,40 +205,24 @@ class Database:
     
     def _create_default_users_sqlite(self):
         """Create default test users in SQLite"""
-        default_users = [
-            ('fiscalizer1', 'fisc123', 'fiscalizer', 'João Silva'),
-            ('fiscalizer2', 'fisc456', 'fiscalizer', 'Maria Santos'),
-            ('client1', 'client123', 'client', 'Carlos Souza'),
-            ('client2', 'client456', 'client', 'Ana Costa'),
-        ]
-        
-        for username, password, role, name in default_users:
-            try:
-                password_hash = hashlib.sha256(password.encode()).hexdigest()
-                self.cursor.execute('''
-                    INSERT OR IGNORE INTO users (username, password_hash, role, name)
-                    VALUES (?, ?, ?, ?)
-                ''', (username, password_hash, role, name))
-            except:
-                pass
-        
-        self.conn.commit()
+        # One executemany inside one transaction: a commit per row costs
+        # an fsync per row
+        try:
+            conn = self._get_conn()
+            conn.executemany(_SQL_INSERT_DEFAULT_USERS, _DEFAULT_USERS)
+            conn.commit()
+        except Exception as e:
+            print(f"Error creating default users: {e}")
     
     def _create_default_users_mongodb(self):
         """Create default test users in MongoDB"""
         if self.db.users.count_documents({}) == 0:
-            default_users = [
-                {'username': 'fiscalizer1', 'password': 'fisc123', 'role': 'fiscalizer', 'name': 'João Silva'},
-                {'username': 'fiscalizer2', 'password': 'fisc456', 'role': 'fiscalizer', 'name': 'Maria Santos'},
-                {'username': 'client1', 'password': 'client123', 'role': 'client', 'name': 'Carlos Souza'},
-                {'username': 'client2', 'password': 'client456', 'role': 'client', 'name': 'Ana Costa'},
-            ]
-            
-            for user in default_users:
-                user['password_hash'] = hashlib.sha256(user['password'].encode()).hexdigest()
-                del user['password']
-                user['created_at'] = datetime.now()
-                self.db.users.insert_one(user)
+            now = datetime.now()
+            self.db.users.insert_many([
+                {'username': username, 'password_hash': password_hash,
+                 'role': role, 'name': name, 'created_at': now}
+                for username, password_hash, role, name in _DEFAULT_USERS
+            ], ordered=False)
     
     # User Management
     
@@ -151,8 +234,8 @@ class Database:
                 user['_id'] = str(user['_id'])
             return user
         else:
-            self.cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-            row = self.cursor.fetchone()
+            cur = self._get_conn().execute(_SQL_GET_USER, (username,))
+            row = cur.fetchone()
             return dict(row) if row else None
     
     def create_user(self, username: str, password: str, role: str, name: str) -> bool:
@@ -169,11 +252,9 @@ class Database:
                     'created_at': datetime.now()
                 })
             else:
-                self.cursor.execute('''
-                    INSERT INTO users (username, password_hash, role, name)
-                    VALUES (?, ?, ?, ?)
-                ''', (username, password_hash, role, name))
-                self.conn.commit()
+                conn = self._get_conn()
+                conn.execute(_SQL_INSERT_USER, (username, password_hash, role, name))
+                conn.commit()
             return True
         except Exception as e:
             print(f"Error creating user: {e}")
@@ -183,8 +264,7 @@ class Database:
         """Validate user credentials"""
         user = self.get_user(username)
         if user:
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            if user['password_hash'] == password_hash:
+            if _verify_password(user['password_hash'], password):
                 # Update last login
                 self.update_last_login(username)
                 return {
@@ -202,10 +282,9 @@ class Database:
                 {'$set': {'last_login': datetime.now()}}
             )
         else:
-            self.cursor.execute('''
-                UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE username = ?
-            ''', (username,))
-            self.conn.commit()
+            conn = self._get_conn()
+            conn.execute(_SQL_UPDATE_LAST_LOGIN, (username,))
+            conn.commit()
     
     # Blockchain Index Management
     
@@ -221,23 +300,61 @@ class Database:
                     'timestamp': datetime.now(),
                     'fiscalizer_id': fiscalizer_id,
                     'origin': data.get('origin'),
+                    'origin_lower': (data.get('origin') or '').lower(),
                     'quality_grade': data.get('quality_grade'),
                     'weight_kg': data.get('weight_kg'),
                     'created_at': datetime.now()
                 })
             else:
-                self.cursor.execute('''
-                    INSERT OR REPLACE INTO blockchain_index 
-                    (batch_id, block_index, block_hash, timestamp, fiscalizer_id, origin, quality_grade, weight_kg)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (batch_id, block_index, block_hash, datetime.now(), fiscalizer_id, 
-                      data.get('origin'), data.get('quality_grade'), data.get('weight_kg')))
-                self.conn.commit()
+                conn = self._get_conn()
+                # Integer nanoseconds: no datetime allocation per row and
+                # a smaller, faster-to-compare value in the column
+                conn.execute(_SQL_INSERT_INDEX,
+                             (batch_id, block_index, block_hash, time.time_ns(), fiscalizer_id,
+                              data.get('origin'), data.get('quality_grade'), data.get('weight_kg')))
+                conn.commit()
             return True
         except Exception as e:
             print(f"Error indexing entry: {e}")
             return False
     
+    def bulk_index_blockchain_entries(self, entries: List[Dict]) -> bool:
+        """
+        Index many blockchain entries in one transaction
+        Each entry is a dict with the index_blockchain_entry arguments:
+        batch_id, block_index, block_hash, fiscalizer_id, data
+        """
+        try:
+            if self.db_type == 'mongodb':
+                now = datetime.now()
+                self.db.blockchain_index.insert_many([{
+                    'batch_id': e['batch_id'],
+                    'block_index': e['block_index'],
+                    'block_hash': e['block_hash'],
+                    'timestamp': now,
+                    'fiscalizer_id': e['fiscalizer_id'],
+                    'origin': e['data'].get('origin'),
+                    'origin_lower': (e['data'].get('origin') or '').lower(),
+                    'quality_grade': e['data'].get('quality_grade'),
+                    'weight_kg': e['data'].get('weight_kg'),
+                    'created_at': now
+                } for e in entries], ordered=False)
+            else:
+                # Same integer-nanoseconds timestamp as the single-row
+                # path, so the column stays one type and stays sortable
+                now = time.time_ns()
+                conn = self._get_conn()
+                conn.executemany(_SQL_INSERT_INDEX, [
+                    (e['batch_id'], e['block_index'], e['block_hash'], now,
+                     e['fiscalizer_id'], e['data'].get('origin'),
+                     e['data'].get('quality_grade'), e['data'].get('weight_kg'))
+                    for e in entries])
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error bulk indexing entries: {e}")
+            return False
+
     def find_by_batch(self, batch_id: str) -> Optional[Dict]:
         """Find blockchain entry by batch ID"""
         if self.db_type == 'mongodb':
@@ -246,26 +363,58 @@ class Database:
                 result['_id'] = str(result['_id'])
             return result
         else:
-            self.cursor.execute('SELECT * FROM blockchain_index WHERE batch_id = ?', (batch_id,))
-            row = self.cursor.fetchone()
+            cur = self._get_conn().execute(_SQL_FIND_BATCH, (batch_id,))
+            row = cur.fetchone()
             return dict(row) if row else None
     
     def find_by_origin(self, origin: str) -> List[Dict]:
         """Find all entries from a specific origin"""
         if self.db_type == 'mongodb':
-            results = self.db.blockchain_index.find({'origin': {'$regex': origin, '$options': 'i'}})
-            return [dict(r) for r in results]
+            # Substring over the precomputed origin_lower field is the
+            # authoritative query: matching against lowercase-vs-lowercase
+            # skips per-document case folding, and the projection trims
+            # the payload to what callers render. An anchored prefix
+            # probe can't stand in for it — its results are a strict
+            # subset, so rows with interior matches would be dropped.
+            projection = {'batch_id': 1, 'block_index': 1, 'block_hash': 1,
+                          'origin': 1, 'quality_grade': 1, '_id': 0}
+            return list(self.db.blockchain_index.find(
+                {'origin_lower': {'$regex': re.escape(origin.lower())}}, projection))
         else:
-            self.cursor.execute('SELECT * FROM blockchain_index WHERE origin LIKE ?', (f'%{origin}%',))
-            return [dict(row) for row in self.cursor.fetchall()]
+            # '%X%' is the authoritative query; a 'X%' prefix probe only
+            # finds a strict subset of it, so there is no safe fast path
+            # short of the full substring scan
+            conn = self._get_conn()
+            rows = conn.execute(_SQL_FIND_ORIGIN_LIKE, (f'%{origin}%',)).fetchall()
+            return [dict(row) for row in rows]
     
+    def find_indexes_by_batch(self, batch_id: str) -> List[int]:
+        """Get block indexes recorded for a batch ID"""
+        if self.db_type == 'mongodb':
+            results = self.db.blockchain_index.find(
+                {'batch_id': batch_id}, {'block_index': 1})
+            return [r['block_index'] for r in results]
+        else:
+            cur = self._get_conn().execute(_SQL_BATCH_INDEXES, (batch_id,))
+            return [row['block_index'] for row in cur.fetchall()]
+
+    def find_indexes_by_origin(self, origin: str) -> List[int]:
+        """Get block indexes for an origin (case-insensitive exact match)"""
+        if self.db_type == 'mongodb':
+            results = self.db.blockchain_index.find(
+                {'origin_lower': origin.lower()}, {'block_index': 1, '_id': 0})
+            return [r['block_index'] for r in results]
+        else:
+            cur = self._get_conn().execute(_SQL_ORIGIN_INDEXES, (origin,))
+            return [row['block_index'] for row in cur.fetchall()]
+
     def get_all_indexes(self) -> List[Dict]:
         """Get all blockchain index entries"""
         if self.db_type == 'mongodb':
-            return [dict(r) for r in self.db.blockchain_index.find()]
+            return [dict(r) for r in self.db.blockchain_index.find({}, {'_id': 0})]
         else:
-            self.cursor.execute('SELECT * FROM blockchain_index ORDER BY block_index')
-            return [dict(row) for row in self.cursor.fetchall()]
+            cur = self._get_conn().execute(_SQL_ALL_INDEXES)
+            return [dict(row) for row in cur.fetchall()]
     
     # Analytics
     
@@ -279,27 +428,24 @@ class Database:
                 'total_indexed_entries': self.db.blockchain_index.count_documents({})
             }
         else:
+            conn = self._get_conn()
             stats = {}
-            self.cursor.execute('SELECT COUNT(*) as count FROM users')
-            stats['total_users'] = self.cursor.fetchone()['count']
-            
-            self.cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'fiscalizer'")
-            stats['total_fiscalizers'] = self.cursor.fetchone()['count']
-            
-            self.cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'client'")
-            stats['total_clients'] = self.cursor.fetchone()['count']
-            
-            self.cursor.execute('SELECT COUNT(*) as count FROM blockchain_index')
-            stats['total_indexed_entries'] = self.cursor.fetchone()['count']
+            stats['total_users'] = conn.execute('SELECT COUNT(*) as count FROM users').fetchone()['count']
+            stats['total_fiscalizers'] = conn.execute("SELECT COUNT(*) as count FROM users WHERE role = 'fiscalizer'").fetchone()['count']
+            stats['total_clients'] = conn.execute("SELECT COUNT(*) as count FROM users WHERE role = 'client'").fetchone()['count']
+            stats['total_indexed_entries'] = conn.execute('SELECT COUNT(*) as count FROM blockchain_index').fetchone()['count']
             
             return stats
     
     def close(self):
-        """Close database connection"""
+        """Close the current thread's database connection"""
         if self.db_type == 'mongodb':
             self.client.close()
         else:
-            self.conn.close()
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None:
+                conn.close()
+                self._local.conn = None
 
 
 # Singleton instance
@@ -1,40 +1,213 @@
+import bisect
 import hashlib
 import json
+import time
+from dataclasses import asdict, is_dataclass
 from datetime import datetime
 from typing import List, Dict, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from pybloom_live import ScalableBloomFilter
+except ImportError:
+    ScalableBloomFilter = None
+
+if orjson is not None:
+    def _canonical_dumps(obj) -> bytes:
+        """Canonical insertion-ordered JSON bytes for hashing"""
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
+else:
+    def _canonical_dumps(obj) -> bytes:
+        """Canonical insertion-ordered JSON bytes for hashing
+
+        Matches orjson's output byte-for-byte (compact separators, UTF-8)
+        so hashes are identical with or without orjson installed.
+        """
+        return json.dumps(obj, separators=(',', ':'),
+                          ensure_ascii=False).encode('utf-8')
+
+    _loads = json.loads
+
+
+# Canonical key order for entry payloads. Hash serialization relies on
+# dict insertion order instead of per-dump key sorting, so every entry
+# is rewritten into this order before it is hashed; JSON round-trips
+# preserve object order, so exported chains still verify on import.
+CANONICAL_ORDER = (
+    'fiscalizer_id', 'coffee_batch', 'origin', 'location', 'harvest_date',
+    'quality_grade', 'certifications', 'certifications_display', 'weight_kg',
+    'processing_method', 'variety', 'altitude_meters', 'notes',
+    'entry_timestamp', 'entry_type',
+)
+
+
+def _canonical_entry(data: Dict) -> Dict:
+    """Entry dict with its keys pinned to CANONICAL_ORDER
+
+    Unknown keys are kept — appended after the canonical ones in sorted
+    order — so nothing a caller sends is silently dropped.
+    """
+    ordered = {key: data[key] for key in CANONICAL_ORDER if key in data}
+    if len(ordered) != len(data):
+        for key in sorted(data.keys() - ordered.keys()):
+            ordered[key] = data[key]
+    return ordered
+
+
+def _entry_dict(entry) -> Dict:
+    """
+    Entry payload as a plain dict
+    Callers may hand over a slotted dataclass instead of a dict; its
+    unset (None) fields are dropped so the hashed payload stays compact
+    """
+    if is_dataclass(entry):
+        return {key: value for key, value in asdict(entry).items()
+                if value is not None}
+    return entry
+
+
+def _merkle_root(leaves: List[bytes]) -> str:
+    """
+    Merkle root of a list of leaf digests
+
+    Pairwise-hashes each level, duplicating the last leaf when a level
+    has an odd count, until a single root remains.
+    """
+    level = leaves
+    while len(level) > 1:
+        if len(level) % 2:
+            level = level + [level[-1]]
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest()
+                 for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def _difficulty_target(difficulty: int) -> bytes:
+    """Largest digest that still has `difficulty` leading zero hex digits
+
+    A digest meets the difficulty exactly when digest <= target, which
+    bytes comparison resolves in a single memcmp.
+    """
+    full, odd = divmod(difficulty, 2)
+    return b'\x00' * full + (b'\x0f' if odd else b'') + b'\xff' * (32 - full - odd)
+
+
+def _mine(head: bytes, tail: bytes, target: bytes, start_nonce: int = 0):
+    """
+    Nonce search kernel for proof of work
+
+    The serialized block is split around the nonce digits once, so each
+    attempt hashes head + digits + tail instead of re-running json.dumps.
+    Everything the loop touches is a local, keeping per-attempt overhead
+    to one hash call plus a single memcmp against the precomputed
+    difficulty target. Returns (nonce, digest).
+
+    The constant head is absorbed into a sha256 object once; each attempt
+    copies that midstate and only feeds it the nonce digits and the short
+    tail, so the bulk of the block is compressed a single time. The
+    difficulty is checked on the raw digest — no hex conversion until a
+    winner is found.
+
+    hashlib's OpenSSL backend releases the GIL and dispatches to
+    hardware SHA where available, so the compression itself is already
+    native-speed; only the loop bookkeeping runs in the interpreter.
+    """
+    base = hashlib.sha256(head)
+    base_copy = base.copy
+    nonce = start_nonce
+    while True:
+        h = base_copy()
+        # b'%d' formats the nonce digits straight to bytes, skipping the
+        # str() intermediate and its encode
+        h.update(b'%d' % nonce + tail)
+        digest = h.digest()
+        if digest <= target:
+            return nonce, digest
+        nonce += 1
+
+
 # Block class for coffee traceability
 class Block:
-    def __init__(self, index: int, timestamp: str, data: Dict, previous_hash: str, nonce: int = 0):
+    # No per-instance __dict__: slots trim a couple hundred bytes per
+    # block, which adds up over a long chain
+    __slots__ = ('index', 'timestamp', 'data', 'previous_hash', 'nonce',
+                 'hash', '_dict_cache')
+
+    def __init__(self, index: int, timestamp: int, data: Dict, previous_hash: str,
+                 nonce: int = 0, compute_hash: bool = True):
         self.index = index
+        # Nanoseconds since epoch for new blocks; chains exported by
+        # older builds carry ISO strings, which are kept verbatim so
+        # their hashes still verify
         self.timestamp = timestamp
         self.data = data
         self.previous_hash = previous_hash
         self.nonce = nonce
-        self.hash = self.get_hash()
+        # Blocks headed straight into proof_of_work skip the initial
+        # serialize-and-hash — the miner overwrites it anyway
+        self.hash = self.get_hash() if compute_hash else ''
+        self._dict_cache = None
     
     # Creates a sha256 hash, encodes it as utf-8
     def get_hash(self) -> str:
-        # json.dumps(..., sort_keys=True) secures consistent alphabetical ordering in keys
-        block_string = json.dumps({
+        return self.get_digest().hex()
+
+    def get_digest(self) -> bytes:
+        """Raw SHA-256 digest of the block, for byte-level checks"""
+        # Insertion order is canonical: block fields are always built in
+        # this literal order and entry payloads pass through
+        # _canonical_entry, so no per-dump key sort is needed
+        block_bytes = _canonical_dumps({
             'index': self.index,
             'timestamp': self.timestamp,
             'data': self.data,
             'previous_hash': self.previous_hash,
             'nonce': self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode('utf-8')).hexdigest()
+        })
+        return hashlib.sha256(block_bytes).digest()
     
-    def to_dict(self) -> Dict:
-        """Convert block to dictionary for JSON serialization"""
-        return {
+    def get_legacy_digest(self) -> bytes:
+        """Digest in the byte form older exports hashed
+
+        Chains exported before the compact canonical form serialized
+        blocks with plain json.dumps: spaced separators, ASCII escapes,
+        sorted keys. Import validation retries against these bytes
+        before rejecting a stored hash.
+        """
+        block_string = json.dumps({
             'index': self.index,
             'timestamp': self.timestamp,
             'data': self.data,
             'previous_hash': self.previous_hash,
-            'nonce': self.nonce,
-            'hash': self.hash
-        }
+            'nonce': self.nonce
+        }, sort_keys=True)
+        return hashlib.sha256(block_string.encode('utf-8')).digest()
+
+    def to_dict(self) -> Dict:
+        """Convert block to dictionary for JSON serialization"""
+        # Blocks never change after mining, so build the dict once and reuse it
+        if self._dict_cache is None:
+            block_dict = {
+                'index': self.index,
+                'timestamp': self.timestamp,
+                'data': self.data,
+                'previous_hash': self.previous_hash,
+                'nonce': self.nonce,
+                'hash': self.hash
+            }
+            # ISO form is display-only and derived lazily; the raw value
+            # stays as-is because it is part of the hashed content
+            if isinstance(self.timestamp, int):
+                block_dict['timestamp_iso'] = datetime.fromtimestamp(
+                    self.timestamp / 1e9).isoformat()
+            self._dict_cache = block_dict
+        return self._dict_cache
 
 
 class Blockchain:
@@ -42,18 +215,59 @@ class Blockchain:
         self.chain: List[Block] = []
         self.pending_entries: List[Dict] = []
         self.difficulty = 2  # Number of leading zeros required in hash
+
+        # In-memory indexes: batch and origin queries resolve through
+        # these dicts instead of scanning the whole chain per lookup
+        self._by_batch: Dict[str, List[Block]] = {}
+        self._by_origin: Dict[str, List[Block]] = {}
+
+        # Sorted mirror of the origin keys: prefix queries bisect into
+        # this list and scan only the matching range
+        self._origin_keys: List[str] = []
+
+        # Optional Bloom front for batch lookups: unknown batch ids (the
+        # common case for probing clients) are rejected by a few bit
+        # tests without touching the index dict
+        self._batch_bloom = (ScalableBloomFilter(initial_capacity=10000,
+                                                 error_rate=0.001)
+                             if ScalableBloomFilter is not None else None)
+
+        # Structure-of-arrays mirrors of the per-block hash fields: the
+        # validation linkage check scans two flat string lists instead
+        # of chasing a Block object per element
+        self._hashes: List[str] = []
+        self._prev_hashes: List[str] = []
+
+        # Highest block index already verified; the chain is append-only,
+        # so validation only needs to look past this watermark
+        self._validated_upto = 0
+
         self.create_genesis_block()
-    
+
+    @property
+    def difficulty(self) -> int:
+        """Number of leading zero hex digits required in block hashes"""
+        return self._difficulty
+
+    @difficulty.setter
+    def difficulty(self, value: int):
+        self._difficulty = value
+        self._target_bytes = _difficulty_target(value)
+        # Blocks validated against the old target must be re-checked
+        self._validated_upto = 0
+
     def create_genesis_block(self):
         """Create the first block in the blockchain"""
         genesis_block = Block(
             index=0,
-            timestamp=datetime.now().isoformat(),
+            timestamp=time.time_ns(),
             data={'type': 'genesis', 'message': 'Coffee Traceability Blockchain Genesis Block'},
             previous_hash='0',
             nonce=0
         )
         self.chain.append(genesis_block)
+        self._hashes.append(genesis_block.hash)
+        self._prev_hashes.append(genesis_block.previous_hash)
     
     def get_latest_block(self) -> Block:
         """Get the most recent block in the chain"""
@@ -80,26 +294,42 @@ class Blockchain:
         Returns:
             Dictionary with the created block information
         """
+        entry_data = _entry_dict(entry_data)
         latest_block = self.get_latest_block()
-        
-        # Add timestamp and entry type to data
-        entry_data['entry_timestamp'] = datetime.now().isoformat()
+
+        # Add timestamp and entry type to data; integer nanoseconds are
+        # cheaper than two datetime allocations plus ISO formatting and
+        # keep the hashed payload compact
+        now_ns = time.time_ns()
+        entry_data['entry_timestamp'] = now_ns
         entry_data['entry_type'] = 'coffee_entry'
+        # Join once at insertion; display paths reuse the cached string
+        # instead of re-joining the list on every read
+        if 'certifications' in entry_data:
+            entry_data['certifications_display'] = ', '.join(entry_data['certifications'])
+        entry_data = _canonical_entry(entry_data)
         
         new_block = Block(
             index=latest_block.index + 1,
-            timestamp=datetime.now().isoformat(),
+            timestamp=now_ns,
             data=entry_data,
             previous_hash=latest_block.hash,
-            nonce=0
+            nonce=0,
+            compute_hash=False
         )
         
         # Proof of work (simple implementation)
-        new_block = self.proof_of_work(new_block)
+        new_block, digest = self.proof_of_work(new_block)
         
-        # Validate before adding
-        if self.is_valid_new_block(new_block, latest_block):
+        # Validate before adding; the miner already hashed these exact
+        # bytes, so hand the digest over instead of re-hashing
+        if self.is_valid_new_block(new_block, latest_block, expected_digest=digest):
             self.chain.append(new_block)
+            self._hashes.append(new_block.hash)
+            self._prev_hashes.append(new_block.previous_hash)
+            self._index_block(new_block)
+            # is_valid_new_block just checked this block against the tip
+            self._validated_upto = new_block.index
             return {
                 'success': True,
                 'block': new_block.to_dict(),
@@ -111,53 +341,222 @@ class Blockchain:
                 'message': 'Invalid block, entry not added'
             }
     
-    def proof_of_work(self, block: Block) -> Block:
+    def add_entries(self, entries: List[Dict]) -> Dict:
+        """
+        Add several coffee traceability entries under a single block
+
+        The entries are committed together beneath a Merkle root of
+        their canonical serializations, so one proof-of-work run covers
+        the whole batch instead of one nonce search per entry.
+
+        Args:
+            entries: List of entry dictionaries, same shape as add_entry
+
+        Returns:
+            Dictionary with the created block information
+        """
+        if not entries:
+            return {
+                'success': False,
+                'message': 'No entries to add'
+            }
+
+        entries = [_entry_dict(entry) for entry in entries]
+        latest_block = self.get_latest_block()
+
+        now_ns = time.time_ns()
+        for entry_data in entries:
+            entry_data['entry_timestamp'] = now_ns
+            entry_data['entry_type'] = 'coffee_entry'
+            if 'certifications' in entry_data:
+                entry_data['certifications_display'] = ', '.join(entry_data['certifications'])
+        entries = [_canonical_entry(entry) for entry in entries]
+
+        leaves = [hashlib.sha256(_canonical_dumps(entry)).digest()
+                  for entry in entries]
+
+        new_block = Block(
+            index=latest_block.index + 1,
+            timestamp=now_ns,
+            data={
+                'type': 'entry_batch',
+                'merkle_root': _merkle_root(leaves),
+                'entries': entries
+            },
+            previous_hash=latest_block.hash,
+            nonce=0,
+            compute_hash=False
+        )
+
+        new_block, digest = self.proof_of_work(new_block)
+
+        if self.is_valid_new_block(new_block, latest_block, expected_digest=digest):
+            self.chain.append(new_block)
+            self._hashes.append(new_block.hash)
+            self._prev_hashes.append(new_block.previous_hash)
+            self._index_block(new_block)
+            self._validated_upto = new_block.index
+            return {
+                'success': True,
+                'block': new_block.to_dict(),
+                'entries_added': len(entries),
+                'message': 'Entries added successfully to blockchain'
+            }
+        else:
+            return {
+                'success': False,
+                'message': 'Invalid block, entries not added'
+            }
+
+    @staticmethod
+    def _entry_view(block: Block, entry: Optional[Dict]) -> Dict:
+        """
+        Per-entry view of an indexed block
+        Blocks mined for a single entry render as-is; entries committed
+        in a Merkle batch are flattened so 'data' holds the one matching
+        entry instead of the whole batch payload
+        """
+        if entry is None:
+            return block.to_dict()
+        return {**block.to_dict(), 'data': entry}
+
+    def _index_block(self, block: Block):
+        """Register a block's entries in the batch and origin indexes"""
+        if block.data.get('type') == 'entry_batch':
+            items = [(block, entry) for entry in block.data['entries']]
+        else:
+            items = [(block, None)]
+
+        for item in items:
+            data = item[1] if item[1] is not None else block.data
+            batch_id = data.get('coffee_batch')
+            if batch_id:
+                self._by_batch.setdefault(batch_id, []).append(item)
+                if self._batch_bloom is not None:
+                    self._batch_bloom.add(batch_id)
+
+            origin = data.get('origin')
+            if origin:
+                origin_key = origin.lower()
+                bucket = self._by_origin.get(origin_key)
+                if bucket is None:
+                    bucket = self._by_origin[origin_key] = []
+                    bisect.insort(self._origin_keys, origin_key)
+                bucket.append(item)
+
+    def _rebuild_indexes(self):
+        """Rebuild the batch/origin indexes and hash mirrors from the chain"""
+        self._by_batch.clear()
+        self._by_origin.clear()
+        self._origin_keys.clear()
+        if ScalableBloomFilter is not None:
+            self._batch_bloom = ScalableBloomFilter(initial_capacity=10000,
+                                                    error_rate=0.001)
+        self._hashes = [block.hash for block in self.chain]
+        self._prev_hashes = [block.previous_hash for block in self.chain]
+        for block in self.chain[1:]:  # Skip genesis block
+            self._index_block(block)
+
+    def proof_of_work(self, block: Block):
         """
         Simple proof of work algorithm
-        Find a nonce value that produces a hash with required difficulty
+        Serializes the block once and only swaps the nonce digits between
+        attempts instead of re-serializing for every candidate hash
+        Returns the mined block together with its raw digest
         """
         block.nonce = 0
-        computed_hash = block.get_hash()
-        
-        while not computed_hash.startswith('0' * self.difficulty):
-            block.nonce += 1
-            computed_hash = block.get_hash()
-        
-        block.hash = computed_hash
-        return block
+        serialized = _canonical_dumps({
+            'index': block.index,
+            'timestamp': block.timestamp,
+            'data': block.data,
+            'previous_hash': block.previous_hash,
+            'nonce': block.nonce
+        })
+
+        # Split around the nonce digits; everything else is constant.
+        # rpartition is safe: the data dict is serialized before the
+        # block-level nonce, so the last occurrence is always the
+        # block's own field.
+        head, _, tail = serialized.rpartition(b'"nonce":0')
+        head = head + b'"nonce":'
+
+        block.nonce, digest = _mine(head, tail, self._target_bytes)
+        block.hash = digest.hex()
+        return block, digest
     
-    def is_valid_new_block(self, new_block: Block, previous_block: Block) -> bool:
-        """Validate a new block before adding it to the chain"""
+    def is_valid_new_block(self, new_block: Block, previous_block: Block,
+                           expected_digest: Optional[bytes] = None) -> bool:
+        """
+        Validate a new block before adding it to the chain
+        expected_digest is the digest the miner just computed from the
+        block's serialized bytes; passing it skips a redundant re-hash.
+        Leave it None whenever the block comes from outside.
+        """
         if previous_block.index + 1 != new_block.index:
             return False
         if previous_block.hash != new_block.previous_hash:
             return False
-        if new_block.get_hash() != new_block.hash:
+        digest = expected_digest if expected_digest is not None else new_block.get_digest()
+        if digest.hex() != new_block.hash:
             return False
-        if not new_block.hash.startswith('0' * self.difficulty):
+        if digest > self._target_bytes:
             return False
         return True
     
+    def verify_block(self, index: int) -> bool:
+        """
+        Verify a single block in place — O(1) regardless of chain length
+        Recomputes only this block's hash and checks its links to the
+        neighbouring blocks; a targeted tamper check doesn't need the
+        full-chain pass
+        """
+        block = self.chain[index]
+        if block.get_hash() != block.hash and \
+                block.get_legacy_digest().hex() != block.hash:
+            return False
+        if index > 0 and block.previous_hash != self.chain[index - 1].hash:
+            return False
+        if index + 1 < len(self.chain) and self.chain[index + 1].previous_hash != block.hash:
+            return False
+        return True
+
+    def invalidate_validation_cache(self):
+        """
+        Force the next is_chain_valid call to re-verify every block
+        Needed after mutating blocks in place (e.g. tamper demos)
+        """
+        self._validated_upto = 0
+
     def is_chain_valid(self) -> bool:
         """
         Validate the entire blockchain
         Returns True if the chain is valid, False otherwise
+        Already-verified blocks are skipped: append-only growth means
+        only blocks past the watermark can be new
         """
-        for i in range(1, len(self.chain)):
+        hashes = self._hashes
+        prev_hashes = self._prev_hashes
+        for i in range(self._validated_upto + 1, len(self.chain)):
             current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
-            
-            # Check if the hash is correct
-            if current_block.hash != current_block.get_hash():
-                return False
-            
-            # Check if previous hash matches
-            if current_block.previous_hash != previous_block.hash:
+
+            # Check if the hash is correct; imported chains may predate
+            # the compact canonical byte form, so retry the legacy form
+            # before rejecting
+            digest = current_block.get_digest()
+            if current_block.hash != digest.hex():
+                digest = current_block.get_legacy_digest()
+                if current_block.hash != digest.hex():
+                    return False
+
+            # Check if previous hash matches, on the flat mirrors
+            if prev_hashes[i] != hashes[i - 1]:
                 return False
-            
-            # Check proof of work
-            if not current_block.hash.startswith('0' * self.difficulty):
+
+            # Check proof of work on the raw digest
+            if digest > self._target_bytes:
                 return False
+
+            self._validated_upto = i
         
         return True
     
@@ -171,11 +570,12 @@ class Blockchain:
         Returns:
             List of all blocks containing data for the specified batch
         """
-        results = []
-        for block in self.chain[1:]:  # Skip genesis block
-            if block.data.get('coffee_batch') == batch_id:
-                results.append(block.to_dict())
-        
+        # Bloom fast-reject: a negative answer is definitive, so misses
+        # never reach the dict probe or build an empty result list
+        if self._batch_bloom is not None and batch_id not in self._batch_bloom:
+            return None
+        results = [self._entry_view(block, entry)
+                   for block, entry in self._by_batch.get(batch_id, [])]
         return results if results else None
     
     def get_entry_by_origin(self, origin: str) -> Optional[List[Dict]]:
@@ -188,19 +588,55 @@ class Blockchain:
         Returns:
             List of all blocks from the specified origin
         """
-        results = []
-        for block in self.chain[1:]:  # Skip genesis block
-            if block.data.get('origin', '').lower() == origin.lower():
-                results.append(block.to_dict())
-        
+        results = [self._entry_view(block, entry)
+                   for block, entry in self._by_origin.get(origin.lower(), [])]
         return results if results else None
     
+    def get_entries_by_origin_prefix(self, prefix: str) -> Optional[List[Dict]]:
+        """
+        Get all entries whose origin starts with the given prefix
+
+        Bisects the sorted origin-key list to the matching range, so
+        the scan touches only origins sharing the prefix — useful for
+        queries like every 'Fazenda ...' farm.
+
+        Args:
+            prefix: Case-insensitive start of the origin name
+
+        Returns:
+            List of matching entries across all matching origins
+        """
+        prefix = prefix.lower()
+        keys = self._origin_keys
+        results = []
+        for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+            key = keys[i]
+            if not key.startswith(prefix):
+                break
+            results.extend(self._entry_view(block, entry)
+                           for block, entry in self._by_origin[key])
+        return results if results else None
+
     def get_all_entries(self) -> List[Dict]:
         """
         Get all entries in the blockchain (excluding genesis block)
         Used by clients to view all coffee traceability records
+        Merkle-batched blocks are flattened into one record per entry
         """
-        return [block.to_dict() for block in self.chain[1:]]
+        return list(self.get_all_entries_iter())
+
+    def get_all_entries_iter(self):
+        """
+        Lazily iterate all entries, one record at a time
+        Same per-entry records as get_all_entries without materializing
+        the whole list — preferable when the result is streamed once
+        """
+        for block in self.chain[1:]:
+            if block.data.get('type') == 'entry_batch':
+                for entry in block.data['entries']:
+                    yield self._entry_view(block, entry)
+            else:
+                yield block.to_dict()
     
     def get_chain_info(self) -> Dict:
         """Get information about the blockchain"""
@@ -212,16 +648,31 @@ class Blockchain:
         }
     
     def export_chain(self, filename: str = 'blockchain_export.json'):
-        """Export the entire blockchain to a JSON file"""
-        chain_data = {
-            'chain': [block.to_dict() for block in self.chain],
-            'length': len(self.chain),
-            'exported_at': datetime.now().isoformat()
-        }
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(chain_data, f, indent=2, ensure_ascii=False)
-        
+        """
+        Export the entire blockchain to a JSON file
+        Blocks are streamed out one at a time, so peak memory stays flat
+        instead of holding the whole chain twice during serialization
+        """
+        with open(filename, 'wb', buffering=1 << 20) as f:
+            f.write(b'{"chain":[')
+            for i, block in enumerate(self.chain):
+                if i:
+                    f.write(b',')
+                f.write(_canonical_dumps(block.to_dict()))
+            f.write(b'],"length":%d,"exported_at":%s}'
+                    % (len(self.chain), _canonical_dumps(datetime.now().isoformat())))
+
+        return filename
+
+    def export_chain_ndjson(self, filename: str = 'blockchain_export.ndjson'):
+        """
+        Export the blockchain as newline-delimited JSON, one block per
+        line — the cheapest format to stream back in with import_chain
+        """
+        with open(filename, 'wb', buffering=1 << 20) as f:
+            for block in self.chain:
+                f.write(_canonical_dumps(block.to_dict()) + b'\n')
+
         return filename
     
     def import_chain(self, filename: str) -> bool:
@@ -231,28 +682,49 @@ class Blockchain:
         """
         try:
             with open(filename, 'r', encoding='utf-8') as f:
-                chain_data = json.load(f)
-            
+                first_line = f.readline()
+                if first_line.lstrip().startswith('{"chain"') or first_line.strip() == '{':
+                    # Single JSON document with a 'chain' array
+                    f.seek(0)
+                    block_dicts = _loads(f.read())['chain']
+                else:
+                    # Newline-delimited: parse block-by-block
+                    block_dicts = [_loads(first_line)]
+                    block_dicts.extend(_loads(line) for line in f if line.strip())
+
             # Reconstruct the chain
             imported_chain = []
-            for block_data in chain_data['chain']:
+            for block_data in block_dicts:
+                # Keep the stored hash rather than recomputing: the file
+                # may use the legacy byte form, and validation below
+                # checks the stored value against both forms
                 block = Block(
                     index=block_data['index'],
                     timestamp=block_data['timestamp'],
                     data=block_data['data'],
                     previous_hash=block_data['previous_hash'],
-                    nonce=block_data['nonce']
+                    nonce=block_data['nonce'],
+                    compute_hash=False
                 )
+                block.hash = block_data['hash']
                 imported_chain.append(block)
             
             # Temporarily replace chain for validation
             original_chain = self.chain
+            original_watermark = self._validated_upto
             self.chain = imported_chain
-            
+            self._validated_upto = 0
+            self._hashes = [block.hash for block in imported_chain]
+            self._prev_hashes = [block.previous_hash for block in imported_chain]
+
             if self.is_chain_valid():
+                self._rebuild_indexes()
                 return True
             else:
                 self.chain = original_chain
+                self._validated_upto = original_watermark
+                self._hashes = [block.hash for block in original_chain]
+                self._prev_hashes = [block.previous_hash for block in original_chain]
                 return False
                 
         except Exception as e:
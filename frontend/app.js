@@ -523,7 +523,7 @@ function createEntryCard(entry) {
                     <i class="fas fa-clock"></i>
                     <div>
                         <div class="entry-label">Block Time</div>
-                        <div class="entry-value">${new Date(entry.timestamp).toLocaleString()}</div>
+                        <div class="entry-value">${new Date(entry.timestamp_iso || entry.timestamp).toLocaleString()}</div>
                     </div>
                 </div>
             </div>
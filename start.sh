@@ -14,7 +14,7 @@ if [ ! -d "venv" ]; then
     echo "Creating virtual environment..."
     python3 -m venv venv
     source venv/bin/activate
-    pip install flask flask-cors pyjwt
+    pip install -r requirements.txt
 else
     source venv/bin/activate
 fi
@@ -25,11 +25,15 @@ mkdir -p data
 # Export secret key (change this in production!)
 export SECRET_KEY='your-secret-key-change-in-production'
 
-# Start the backend API server
+# Start the backend API server (gunicorn when available, dev server otherwise)
 echo "🚀 Starting Backend API Server..."
 echo "   API will be available at: http://localhost:5000"
 echo ""
-cd backend/api && python3 app.py &
+if command -v gunicorn > /dev/null; then
+    (cd backend/api && gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:5000 wsgi:app) &
+else
+    (cd backend/api && python3 app.py) &
+fi
 API_PID=$!
 
 echo "⏳ Waiting for API server to start..."
@@ -5,17 +5,46 @@ Demonstrates how to interact with the API
 
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 BASE_URL = "http://localhost:5000/api"
 
+def _pretty(raw: bytes) -> str:
+    """Re-indent a raw JSON body, via orjson's C codec when available"""
+    if orjson is not None:
+        return orjson.dumps(orjson.loads(raw), option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(json.loads(raw), indent=2)
+
+
+def _post_json(session, url, payload, headers=None):
+    """POST a JSON payload, encoding with orjson when available"""
+    body = orjson.dumps(payload) if orjson is not None else json.dumps(payload).encode()
+    headers = {**(headers or {}), "Content-Type": "application/json"}
+    return session.post(url, data=body, headers=headers)
+
+
 def print_response(title, response):
     """Helper function to print formatted responses"""
     print(f"\n{'='*60}")
     print(f"{title}")
     print(f"{'='*60}")
     print(f"Status Code: {response.status_code}")
+    body = response.content
+    # Don't re-indent huge bodies (e.g. the full chain listing) just to
+    # scroll them past the terminal — show the size and a short preview
+    if len(body) > 16384:
+        print(f"[{len(body)} bytes, truncated]")
+        print(body[:500].decode('utf-8', 'replace'))
+        print("...")
+        print(body[-500:].decode('utf-8', 'replace'))
+        return
     try:
-        print(json.dumps(response.json(), indent=2))
+        print(_pretty(body))
     except:
         print(response.text)
 
@@ -25,13 +54,20 @@ def test_api():
     
     print("\n🚀 Testing Coffee Traceability Blockchain API\n")
     
+    # One pooled session for the whole flow: the TCP connection to the
+    # API is set up once and kept alive across all the calls below
+    session = requests.Session()
+    # Ask for gzip transfer; requests decodes transparently, and the
+    # full-chain listing compresses roughly 10x on the wire
+    session.headers['Accept-Encoding'] = 'gzip'
+    
     # 1. Login as fiscalizer
     print("\n1️⃣ Testing Fiscalizer Login...")
     login_data = {
         "username": "fiscalizer1",
         "password": "fisc123"
     }
-    response = requests.post(f"{BASE_URL}/auth/login", json=login_data)
+    response = _post_json(session, f"{BASE_URL}/auth/login", login_data)
     print_response("Fiscalizer Login", response)
     
     if response.status_code != 200:
@@ -47,7 +83,7 @@ def test_api():
         "username": "client1",
         "password": "client123"
     }
-    response = requests.post(f"{BASE_URL}/auth/login", json=client_login_data)
+    response = _post_json(session, f"{BASE_URL}/auth/login", client_login_data)
     print_response("Client Login", response)
     
     client_token = response.json()['token']
@@ -65,7 +101,7 @@ def test_api():
         "processing_method": "Washed",
         "notes": "Premium specialty coffee from high altitude region"
     }
-    response = requests.post(f"{BASE_URL}/entries", json=entry1, headers=fiscalizer_headers)
+    response = _post_json(session, f"{BASE_URL}/entries", entry1, fiscalizer_headers)
     print_response("Create Entry 1", response)
     
     # 4. Fiscalizer creates second entry
@@ -80,7 +116,7 @@ def test_api():
         "processing_method": "Natural",
         "notes": "Natural process, fruity notes"
     }
-    response = requests.post(f"{BASE_URL}/entries", json=entry2, headers=fiscalizer_headers)
+    response = _post_json(session, f"{BASE_URL}/entries", entry2, fiscalizer_headers)
     print_response("Create Entry 2", response)
     
     # 5. Client tries to create entry (should fail)
@@ -93,38 +129,26 @@ def test_api():
         "weight_kg": 500,
         "processing_method": "Honey"
     }
-    response = requests.post(f"{BASE_URL}/entries", json=entry3, headers=client_headers)
+    response = _post_json(session, f"{BASE_URL}/entries", entry3, client_headers)
     print_response("Client Create Entry (Forbidden)", response)
     
-    # 6. Get all entries
-    print("\n6️⃣ Testing Get All Entries...")
-    response = requests.get(f"{BASE_URL}/entries", headers=client_headers)
-    print_response("All Entries", response)
-    
-    # 7. Query specific batch
-    print("\n7️⃣ Testing Query by Batch ID...")
-    response = requests.get(f"{BASE_URL}/entries/batch/BATCH-2025-TEST-001", headers=client_headers)
-    print_response("Query Batch BATCH-2025-TEST-001", response)
-    
-    # 8. Query by origin
-    print("\n8️⃣ Testing Query by Origin...")
-    response = requests.get(f"{BASE_URL}/entries/origin/Fazenda São José", headers=client_headers)
-    print_response("Query Origin 'Fazenda São José'", response)
-    
-    # 9. Get blockchain info
-    print("\n9️⃣ Testing Get Blockchain Info...")
-    response = requests.get(f"{BASE_URL}/blockchain/info", headers=client_headers)
-    print_response("Blockchain Info", response)
-    
-    # 10. Validate blockchain
-    print("\n🔟 Testing Blockchain Validation...")
-    response = requests.get(f"{BASE_URL}/blockchain/validate", headers=client_headers)
-    print_response("Blockchain Validation", response)
-    
-    # 11. Health check
-    print("\n1️⃣1️⃣ Testing Health Check...")
-    response = requests.get(f"{BASE_URL}/health")
-    print_response("Health Check", response)
+    # 6-11. Read-only queries: these calls are independent of each other,
+    # so issue them concurrently instead of paying one round-trip each
+    print("\n6️⃣-1️⃣1️⃣ Testing read-only endpoints concurrently...")
+    read_calls = [
+        ("All Entries", f"{BASE_URL}/entries", client_headers),
+        ("Query Batch BATCH-2025-TEST-001", f"{BASE_URL}/entries/batch/BATCH-2025-TEST-001", client_headers),
+        ("Query Origin 'Fazenda São José'", f"{BASE_URL}/entries/origin/Fazenda São José", client_headers),
+        ("Blockchain Info", f"{BASE_URL}/blockchain/info", client_headers),
+        ("Blockchain Validation", f"{BASE_URL}/blockchain/validate", client_headers),
+        ("Health Check", f"{BASE_URL}/health", None),
+    ]
+    with ThreadPoolExecutor(max_workers=len(read_calls)) as executor:
+        futures = [executor.submit(session.get, url, headers=headers)
+                   for _, url, headers in read_calls]
+        # Print in the original order so output stays deterministic
+        for (title, _, _), future in zip(read_calls, futures):
+            print_response(title, future.result())
     
     print("\n\n✅ API Testing Complete!\n")
 
@@ -0,0 +1,10 @@
+"""
+WSGI entry point for the standalone API
+
+The Werkzeug dev server started by `python3 api_blockchain.py` is
+single-process; for real load serve this module instead:
+
+    gunicorn -w 4 -k gthread --threads 8 wsgi:app
+"""
+
+from api_blockchain import app  # noqa: F401